@@ -1,25 +1,52 @@
 """
 Railway 배포용 Flask 애플리케이션
 - Oracle Cloud Wallet 자동 설정
-- cx_Oracle 사용
+- cx_Oracle 사용 (SessionPool로 연결 재사용)
 - ChromaDB 제거 (메모리 최적화)
 - Health Check 엔드포인트
 """
 
 from flask import Flask, request, jsonify, session
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
 import cx_Oracle
 import os
 import json
+import re
+import time
+import threading
+import hashlib
+import hmac
+from collections import OrderedDict
+from concurrent.futures import Future
 from datetime import datetime
 import openai
 from dotenv import load_dotenv
 import base64
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 # 환경변수 로드
 load_dotenv()
 
+class OrjsonProvider(DefaultJSONProvider):
+    """orjson 기반 JSON 직렬화 (stdlib json 대비 응답 생성 비용 절감)"""
+
+    def dumps(self, obj, **kwargs):
+        # indent/sort_keys 등 stdlib 옵션은 무시하고 compact 출력
+        return orjson.dumps(
+            obj, default=self.default, option=orjson.OPT_NON_STR_KEYS
+        ).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
 app = Flask(__name__)
+if orjson is not None:
+    app.json = OrjsonProvider(app)
 app.secret_key = os.getenv('SECRET_KEY', 'your-secret-key-here')
 CORS(app, resources={
     r"/*": {
@@ -30,13 +57,32 @@ CORS(app, resources={
     }
 })
 
-# OpenAI API 키 설정
-openai.api_key = os.getenv('OPENAI_API_KEY')
+# OpenAI 클라이언트 (첫 GPT 호출 시 1회 생성, HTTP keep-alive 연결 재사용)
+# API 키가 없어도 앱은 기동하고 GPT 경로(/chat)만 실패하도록 지연 생성
+OPENAI_TIMEOUT = float(os.getenv('OPENAI_TIMEOUT', '30'))
+openai_client = None
+_openai_client_lock = threading.Lock()
+
+def get_openai_client():
+    """OpenAI 클라이언트 반환 (최초 호출 시 생성)"""
+    global openai_client
+
+    if openai_client is None:
+        with _openai_client_lock:
+            if openai_client is None:
+                openai_client = openai.OpenAI(
+                    api_key=os.getenv('OPENAI_API_KEY'),
+                    timeout=OPENAI_TIMEOUT,
+                    max_retries=1
+                )
+    return openai_client
 
 # Oracle Wallet 자동 설정
+WALLET_DIR = os.getenv('WALLET_LOCATION', '/app/wallet')
+
 def setup_wallet_from_env():
     """환경변수에서 Base64 인코딩된 Wallet 파일들을 디코딩하여 생성"""
-    wallet_dir = '/app/wallet'
+    wallet_dir = WALLET_DIR
     os.makedirs(wallet_dir, exist_ok=True)
     
     try:
@@ -71,70 +117,151 @@ def setup_wallet_from_env():
         print(f"❌ Wallet 파일 생성 실패: {e}")
         return False
 
-# 앱 시작 시 Wallet 설정
-wallet_setup_done = False
+# 앱 시작 시 Wallet 설정 (모듈 로드 시 1회)
+setup_wallet_from_env()
+# Oracle 클라이언트가 sqlnet.ora/tnsnames.ora를 찾을 위치 (풀 생성 전 1회만 설정)
+os.environ.setdefault('TNS_ADMIN', WALLET_DIR)
+
+# Oracle 세션 풀 설정
+ORACLE_POOL_MIN = int(os.getenv('ORACLE_POOL_MIN', '2'))
+ORACLE_POOL_MAX = int(os.getenv('ORACLE_POOL_MAX', '10'))
+# 커넥션별 statement 캐시 크기 (동일 SQL 문자열이면 parse 생략)
+ORACLE_STMT_CACHE = int(os.getenv('ORACLE_STMT_CACHE', '50'))
+# 풀이 모두 사용 중일 때 커넥션을 기다리는 최대 시간 (ms)
+ORACLE_POOL_WAIT_TIMEOUT = int(os.getenv('ORACLE_POOL_WAIT_TIMEOUT', '5000'))
+
+def create_session_pool():
+    """Oracle 세션 풀 생성 (cx_Oracle SessionPool + Wallet)"""
+    dsn = cx_Oracle.makedsn(
+        os.getenv('ORACLE_HOST'),
+        os.getenv('ORACLE_PORT', '1522'),
+        service_name=os.getenv('ORACLE_SERVICE_NAME')
+    )
+
+    pool = cx_Oracle.SessionPool(
+        user=os.getenv('ORACLE_USER'),
+        password=os.getenv('ORACLE_PASSWORD'),
+        dsn=dsn,
+        min=ORACLE_POOL_MIN,
+        max=ORACLE_POOL_MAX,
+        increment=1,
+        threaded=True,
+        getmode=cx_Oracle.SPOOL_ATTRVAL_TIMEDWAIT,
+        wait_timeout=ORACLE_POOL_WAIT_TIMEOUT,
+        homogeneous=True,
+        stmtcachesize=ORACLE_STMT_CACHE
+    )
+
+    print(f"✅ Oracle 세션 풀 생성 완료 (min={ORACLE_POOL_MIN}, max={ORACLE_POOL_MAX})")
+    return pool
+
+try:
+    db_pool = create_session_pool()
+except Exception as e:
+    # 시작 시 DB에 접근할 수 없어도 앱은 기동하고, 첫 요청에서 재시도
+    print(f"❌ Oracle 세션 풀 생성 실패: {e}")
+    db_pool = None
+
+_db_pool_lock = threading.Lock()
 
 def get_db_connection():
-    """Oracle DB 연결 (cx_Oracle + Wallet)"""
-    global wallet_setup_done
-    
-    # Wallet 설정 (최초 1회만)
-    if not wallet_setup_done:
-        setup_wallet_from_env()
-        wallet_setup_done = True
-    
+    """Oracle DB 연결 (세션 풀에서 획득)"""
+    global db_pool
+
     try:
-        dsn = cx_Oracle.makedsn(
-            os.getenv('ORACLE_HOST'),
-            os.getenv('ORACLE_PORT', '1522'),
-            service_name=os.getenv('ORACLE_SERVICE_NAME')
-        )
-        
-        connection = cx_Oracle.connect(
-            user=os.getenv('ORACLE_USER'),
-            password=os.getenv('ORACLE_PASSWORD'),
-            dsn=dsn
-        )
-        
-        print("✅ Oracle 연결 성공")
-        return connection
+        if db_pool is None:
+            # 동시 첫 요청들이 풀을 여러 개 만들지 않도록 잠금 후 재확인
+            with _db_pool_lock:
+                if db_pool is None:
+                    db_pool = create_session_pool()
+
+        return db_pool.acquire()
     except Exception as e:
         print(f"❌ Oracle 연결 실패: {e}")
         raise
 
+def release_db_connection(conn):
+    """세션 풀에 연결 반환"""
+    try:
+        db_pool.release(conn)
+    except Exception as e:
+        print(f"❌ Oracle 연결 반환 실패: {e}")
+
+# MIMIC-IV 스키마 소유자
+SCHEMA_OWNER = 'MIMICIV'
+
+# 스키마 메타데이터 조회 쿼리 (테이블 + 행 수 + 컬럼을 한 번에 조회)
+# 컬럼은 "TABLE.COLUMN (TYPE(LEN), NULL)" 형식으로 DB에서 포맷
+SCHEMA_METADATA_QUERY = """
+    SELECT
+        t.table_name,
+        t.num_rows,
+        CASE WHEN c.column_name IS NOT NULL THEN
+            c.table_name || '.' || c.column_name || ' (' || c.data_type
+            || CASE WHEN c.data_length > 0 THEN '(' || c.data_length || ')' END
+            || ', ' || CASE WHEN c.nullable = 'Y' THEN 'NULL' ELSE 'NOT NULL' END || ')'
+        END
+    FROM all_tables t
+    LEFT JOIN all_tab_columns c
+        ON c.owner = t.owner AND c.table_name = t.table_name
+    WHERE t.owner = :owner
+    ORDER BY t.table_name, c.column_id
+"""
+
+# 메타데이터 캐시 (TTL 동안 DB 메타데이터 재조회 생략)
+METADATA_CACHE_TTL = int(os.getenv('METADATA_CACHE_TTL', '600'))
+_metadata_cache = {"ts": 0, "value": None, "contexts": {}}
+_metadata_lock = threading.Lock()
+
+def invalidate_metadata_cache():
+    """메타데이터 캐시 초기화 (스키마 변경 시)"""
+    with _metadata_lock:
+        _metadata_cache["ts"] = 0
+        _metadata_cache["value"] = None
+        _metadata_cache["contexts"] = {}
+
+def get_schema_metadata():
+    """테이블/컬럼 메타데이터 조회 (단일 쿼리, TTL 캐시)
+
+    Returns:
+        {table_name: {"rows": 행 수, "columns": [컬럼 정보 문자열, ...]}} (테이블명 순)
+    """
+    if _metadata_cache["value"] is not None and time.time() - _metadata_cache["ts"] < METADATA_CACHE_TTL:
+        return _metadata_cache["value"]
+    
+    # 만료/초기화 직후 동시 요청들이 딕셔너리 뷰 조회를 중복 실행하지 않도록 1개 스레드만 갱신
+    with _metadata_lock:
+        if _metadata_cache["value"] is not None and time.time() - _metadata_cache["ts"] < METADATA_CACHE_TTL:
+            return _metadata_cache["value"]
+        
+        conn = get_db_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(SCHEMA_METADATA_QUERY, owner=SCHEMA_OWNER)
+            rows = cursor.fetchall()
+            cursor.close()
+        finally:
+            release_db_connection(conn)
+        
+        # 테이블별로 그룹화
+        metadata = {}
+        for table_name, num_rows, column_info in rows:
+            table = metadata.setdefault(table_name, {"rows": num_rows or 0, "columns": []})
+            if column_info:
+                table["columns"].append(column_info)
+        
+        _metadata_cache["value"] = metadata
+        _metadata_cache["contexts"] = {}
+        _metadata_cache["ts"] = time.time()
+    
+    return metadata
+
 def get_all_columns():
     """DB에서 전체 컬럼 정보 조회 (ChromaDB 대신 직접 조회)"""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        query = """
-            SELECT 
-                table_name,
-                column_name,
-                data_type,
-                nullable,
-                data_length
-            FROM all_tab_columns
-            WHERE owner = 'MIMICIV'
-            ORDER BY table_name, column_id
-        """
-        
-        cursor.execute(query)
-        columns = cursor.fetchall()
-        
-        cursor.close()
-        conn.close()
-        
-        # 컬럼 정보를 문자열로 포맷
-        column_info = []
-        for col in columns:
-            table_name, col_name, data_type, nullable, length = col
-            info = f"{table_name}.{col_name} ({data_type}"
-            if length:
-                info += f"({length})"
-            info += ", " + ("NULL" if nullable == 'Y' else "NOT NULL") + ")"
-            column_info.append(info)
+        metadata = get_schema_metadata()
+        
+        column_info = [col for table in metadata.values() for col in table["columns"]]
         
         return "\n".join(column_info[:500])  # 최대 500개 컬럼만 반환
         
@@ -142,90 +269,556 @@ def get_all_columns():
         print(f"❌ 컬럼 정보 조회 실패: {e}")
         return "컬럼 정보를 불러올 수 없습니다."
 
-def generate_sql_with_gpt(user_question, selected_columns=None):
-    """GPT-4를 사용하여 자연어를 SQL로 변환"""
+# ============= Intent별 컬럼 컨텍스트 =============
+# guide_map.json: intent → 참고할 스키마 파일 목록
+with open('guide_map.json', 'rb') as f:
+    GUIDE_MAP = orjson.loads(f.read()) if orjson is not None else json.loads(f.read())
+
+def load_schema_files(guide_map):
+    """guide_map에 등장하는 스키마 파일을 시작 시 1회만 읽어 캐시"""
+    cache = {}
+    for guide_item in guide_map.values():
+        for schema_file in guide_item['schema']:
+            if schema_file in cache:
+                continue
+            try:
+                with open(schema_file, 'r', encoding='utf-8') as f:
+                    cache[schema_file] = f.read()
+            except OSError as e:
+                print(f"⚠️ 스키마 파일 로드 실패 ({schema_file}): {e}")
+    return cache
+
+# 스키마 파일명 → 내용 (정적 파일이므로 요청마다 디스크를 읽지 않음)
+SCHEMA_FILE_CACHE = load_schema_files(GUIDE_MAP)
+
+def read_schema_tables(schema_file):
+    """스키마 파일 첫 줄의 '# [테이블: A, B, ...]' 헤더에서 테이블명 추출"""
+    content = SCHEMA_FILE_CACHE.get(schema_file)
+    if not content:
+        return set()
+    
+    header = content.split('\n', 1)[0]
+    match = re.match(r"#\s*\[테이블:\s*(.*?)\]", header)
+    if not match:
+        return set()
+    return {name.strip().upper() for name in match.group(1).split(',') if name.strip()}
+
+# intent → 관련 테이블 집합
+TABLES_BY_INTENT = {
+    intent: set().union(*(read_schema_tables(f) for f in guide_item['schema']))
+    for intent, guide_item in GUIDE_MAP.items()
+}
+
+# intent 판별 키워드 (우선순위 순서: 구체적인 intent 먼저)
+INTENT_KEYWORDS = [
+    ("임상시험", ["임상시험", "임상", "포함 기준", "제외 기준", "포함기준", "제외기준", "이상반응",
+               "trial", "AE", "ADR", "SUSAR"]),
+    ("약물/투약", ["약물", "처방", "투약", "투여", "항생제", "수액", "용량",
+               "drug", "medication", "prescription"]),
+    ("진단/시술", ["진단", "질환", "질병", "병명", "시술", "수술",
+               "부전", "당뇨", "고혈압", "패혈증", "폐렴", "종양",
+               "ICD", "DRG", "diagnosis", "procedure", "cancer"]),
+    ("검사/바이탈", ["검사", "바이탈", "혈압", "맥박", "체온", "혈당", "미생물", "감염", "세균",
+                "WBC", "Hb", "lab", "vital"]),
+    ("환자/입원", ["환자", "나이", "연령", "성별", "입원", "퇴원", "사망", "중환자실", "재원",
+               "ICU", "patient", "admission"]),
+]
+
+def keywords_pattern(keywords):
+    """키워드 목록을 정규식 alternation으로 변환 (영문 키워드는 앞뒤가 영문자가 아닐 때만 매칭)
+
+    한글도 \\w라서 \\b를 쓰면 'WBC가', 'ICU에'처럼 조사가 붙은 영문 용어가 매칭되지 않음
+    """
+    return "|".join(
+        rf"(?<![A-Za-z]){re.escape(k)}(?![A-Za-z])" if k.isascii() else re.escape(k)
+        for k in keywords
+    )
+
+# 모든 intent 키워드를 named group 하나의 정규식으로 합쳐 질문을 1회만 스캔
+INTENT_NAMES = [intent for intent, _ in INTENT_KEYWORDS]
+INTENT_RE = re.compile(
+    "|".join(f"(?P<i{idx}>{keywords_pattern(keywords)})"
+             for idx, (_, keywords) in enumerate(INTENT_KEYWORDS)),
+    re.IGNORECASE
+)
+
+def infer_intent(user_question):
+    """질문에서 intent 추정 (여러 개 매칭 시 우선순위가 높은 것, 없으면 None)"""
+    best = None
+    for match in INTENT_RE.finditer(user_question):
+        idx = int(match.lastgroup[1:])
+        if best is None or idx < best:
+            best = idx
+            if best == 0:
+                break
+    return INTENT_NAMES[best] if best is not None else None
+
+def get_column_context(intent=None):
+    """intent 관련 테이블의 컬럼 정보만 반환 (intent 없으면 테이블별 컬럼명 요약)"""
     try:
-        # 컬럼 정보 가져오기
-        if selected_columns:
-            column_context = "\n".join(selected_columns)
-        else:
-            column_context = get_all_columns()
+        metadata = get_schema_metadata()
+    except Exception as e:
+        print(f"❌ 컬럼 정보 조회 실패: {e}")
+        return "컬럼 정보를 불러올 수 없습니다."
+    
+    # intent별 컨텍스트는 메타데이터가 갱신될 때까지 재사용
+    contexts = _metadata_cache["contexts"]
+    if intent in contexts:
+        return contexts[intent]
+    
+    tables = TABLES_BY_INTENT.get(intent, set())
+    column_info = [
+        col
+        for name, table in metadata.items() if name in tables
+        for col in table["columns"]
+    ]
+    
+    if column_info:
+        context = "\n".join(column_info[:500])
+    else:
+        # intent 미확인: 타입 없이 테이블별 컬럼명만 나열
+        context = "\n".join(
+            f"{name}: " + ", ".join(col.split(' ', 1)[0].split('.', 1)[1] for col in table["columns"])
+            for name, table in metadata.items()
+        )
+    
+    contexts[intent] = context
+    return context
+
+# GPT 응답의 코드 블록 (```sql ... ``` / ```json ... ``` / ``` ... ```, 닫는 펜스 생략 허용)
+CODE_BLOCK_RE = re.compile(r"```(?:sql\b|json\b)?\s*([\s\S]*?)(?:```|\Z)", re.IGNORECASE)
+
+def strip_sql_code_block(text):
+    """GPT 응답에서 SQL 코드 블록 제거"""
+    match = CODE_BLOCK_RE.search(text)
+    if match:
+        return match.group(1).strip()
+    return text.strip()
+
+# ============= 생성 SQL 캐시 =============
+# 같은 질문(+ 같은 컬럼 범위)은 GPT 호출 없이 이전에 실행 성공한 SQL 재사용
+SQL_CACHE_SIZE = int(os.getenv('SQL_CACHE_SIZE', '1024'))
+SQL_CACHE_PERSIST = os.getenv('SQL_CACHE_PERSIST', 'false').lower() == 'true'
+
+# 영속 캐시 테이블 (SQL_CACHE_PERSIST=true일 때 사용, 사전 생성 필요)
+# CREATE TABLE SQL_CACHE (
+#     HASH      VARCHAR2(64) PRIMARY KEY,
+#     QUESTION  VARCHAR2(4000),
+#     SQL_TEXT  VARCHAR2(4000),
+#     HITS      NUMBER DEFAULT 0,
+#     CREATED   DATE DEFAULT SYSDATE
+# )
+
+# statement 캐시가 적중하도록 SQL 문자열은 모듈 상수로 고정
+SQL_CACHE_SELECT = "SELECT SQL_TEXT FROM SQL_CACHE WHERE HASH = :1"
+SQL_CACHE_HIT = "UPDATE SQL_CACHE SET HITS = HITS + 1 WHERE HASH = :1"
+SQL_CACHE_INSERT = "INSERT INTO SQL_CACHE (HASH, QUESTION, SQL_TEXT) VALUES (:1, :2, :3)"
+SQL_CACHE_DELETE = "DELETE FROM SQL_CACHE WHERE HASH = :1"
+# SQL_TEXT 컬럼 크기 (바이트). 이보다 긴 SQL은 잘린 채 저장되지 않도록 영속 캐시에서 제외
+SQL_CACHE_TEXT_MAX_BYTES = 4000
+
+_sql_cache = OrderedDict()
+_sql_cache_lock = threading.Lock()
+
+def make_sql_cache_key(user_question, selected_columns=None):
+    """질문 정규화(소문자, 공백 정리) + 컬럼 범위로 캐시 키 생성"""
+    normalized = ' '.join(user_question.lower().split())
+    scope = '|'.join(selected_columns) if selected_columns else '*'
+    return hashlib.sha256(f"{scope}\n{normalized}".encode('utf-8')).hexdigest()
+
+def _remember_sql(key, sql):
+    """메모리 캐시에 저장 (LRU)"""
+    with _sql_cache_lock:
+        _sql_cache[key] = sql
+        _sql_cache.move_to_end(key)
+        while len(_sql_cache) > SQL_CACHE_SIZE:
+            _sql_cache.popitem(last=False)
+
+def get_cached_sql(key):
+    """캐시된 SQL 조회 (메모리 → DB 순서)"""
+    with _sql_cache_lock:
+        if key in _sql_cache:
+            _sql_cache.move_to_end(key)
+            return _sql_cache[key]
+    
+    if not SQL_CACHE_PERSIST:
+        return None
+    
+    try:
+        conn = get_db_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(SQL_CACHE_SELECT, [key])
+            row = cursor.fetchone()
+            if row:
+                cursor.execute(SQL_CACHE_HIT, [key])
+                conn.commit()
+            cursor.close()
+        finally:
+            release_db_connection(conn)
         
-        system_prompt = f"""당신은 MIMIC-IV 의료 데이터베이스의 SQL 전문가입니다.
+        if row:
+            _remember_sql(key, row[0])
+            return row[0]
+    except Exception as e:
+        print(f"❌ SQL 캐시 조회 실패: {e}")
+    
+    return None
 
-사용 가능한 컬럼 정보:
-{column_context}
+def cache_sql(key, user_question, sql):
+    """실행 성공한 SQL을 캐시에 저장"""
+    _remember_sql(key, sql)
+    
+    if not SQL_CACHE_PERSIST:
+        return
+    
+    if len(sql.encode('utf-8')) > SQL_CACHE_TEXT_MAX_BYTES:
+        print(f"⚠️ SQL이 {SQL_CACHE_TEXT_MAX_BYTES}바이트를 넘어 영속 캐시에 저장하지 않음")
+        return
+    
+    try:
+        conn = get_db_connection()
+        try:
+            cursor = conn.cursor()
+            # 질문은 조회 키(HASH)에 쓰이지 않으므로 잘라서 저장해도 무방
+            cursor.execute(SQL_CACHE_INSERT, [key, user_question[:1000], sql])
+            conn.commit()
+            cursor.close()
+        finally:
+            release_db_connection(conn)
+    except cx_Oracle.IntegrityError:
+        pass  # 다른 워커가 이미 저장함
+    except Exception as e:
+        print(f"❌ SQL 캐시 저장 실패: {e}")
+
+def evict_cached_sql(key):
+    """실행에 실패한 캐시 SQL 제거 (메모리 + DB)"""
+    with _sql_cache_lock:
+        _sql_cache.pop(key, None)
+    
+    if not SQL_CACHE_PERSIST:
+        return
+    
+    try:
+        conn = get_db_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(SQL_CACHE_DELETE, [key])
+            conn.commit()
+            cursor.close()
+        finally:
+            release_db_connection(conn)
+    except Exception as e:
+        print(f"❌ SQL 캐시 삭제 실패: {e}")
+
+# ============= GPT 요청 배치 처리 =============
+# 짧은 시간 안에 들어온 질문들을 같은 시스템 프롬프트끼리 묶어 GPT를 1회만 호출
+SQL_BATCH_WINDOW = float(os.getenv('SQL_BATCH_WINDOW_MS', '50')) / 1000
+SQL_BATCH_MAX = int(os.getenv('SQL_BATCH_MAX', '8'))
+# 모델 컨텍스트 창 (gpt-4: 8192) 및 질문당 응답 토큰 한도
+GPT_CONTEXT_TOKENS = int(os.getenv('GPT_CONTEXT_TOKENS', '8192'))
+SQL_COMPLETION_TOKENS = 500
+# 배치 지시문 + JSON 항목당 구조 토큰 (여유 있게 추정)
+BATCH_PROMPT_OVERHEAD_TOKENS = 100
+BATCH_ITEM_OVERHEAD_TOKENS = 20
+
+def estimate_prompt_tokens(text):
+    """대략적인 토큰 수 추정 (UTF-8 3바이트당 1토큰: 한글 1자 ≈ 1토큰, 영문은 실제보다 넉넉하게)"""
+    return len(text.encode('utf-8')) // 3 + 1
+
+def batch_fits_context(system_tokens, batch):
+    """시스템 프롬프트 + 질문들 + 응답(500·N) 토큰이 컨텍스트 창 안에 들어가는지 확인"""
+    prompt_tokens = system_tokens + BATCH_PROMPT_OVERHEAD_TOKENS + sum(
+        req.tokens + BATCH_ITEM_OVERHEAD_TOKENS for req in batch
+    )
+    return prompt_tokens + SQL_COMPLETION_TOKENS * len(batch) <= GPT_CONTEXT_TOKENS
+
+class SQLGenerationRequest:
+    """배치 대기 중인 SQL 생성 요청 (배치 응답을 해석하지 못하면 sql/error 모두 None)"""
+
+    def __init__(self, user_question):
+        self.user_question = user_question
+        self.tokens = estimate_prompt_tokens(user_question)
+        self.done = threading.Event()
+        self.sql = None
+        self.error = None
+
+_batch_lock = threading.Lock()
+_pending_batches = {}  # system_prompt -> [SQLGenerationRequest, ...]
+_active_sql_calls = 0  # 진행 중인 GPT 호출 수 (0이면 배치 대기 없이 바로 호출)
+
+# 프롬프트 캐시 적중 통계 (OpenAI가 prompt_tokens_details.cached_tokens를 보고하는 모델에서만 집계)
+_prompt_cache_stats = {"prompt_tokens": 0, "cached_tokens": 0}
+_prompt_cache_stats_lock = threading.Lock()
+
+def record_prompt_usage(response):
+    """응답 usage에서 프롬프트/캐시 토큰 수 누적"""
+    usage = response.usage
+    if usage is None:
+        return
+    details = getattr(usage, "prompt_tokens_details", None)
+    with _prompt_cache_stats_lock:
+        _prompt_cache_stats["prompt_tokens"] += usage.prompt_tokens or 0
+        _prompt_cache_stats["cached_tokens"] += getattr(details, "cached_tokens", None) or 0
+
+def request_sql_completion(system_prompt, user_content, max_tokens=SQL_COMPLETION_TOKENS):
+    """GPT-4 호출 후 응답 텍스트 반환"""
+    response = get_openai_client().chat.completions.create(
+        model="gpt-4",
+        messages=[
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_content}
+        ],
+        temperature=0.3,
+        max_tokens=max_tokens
+    )
+    record_prompt_usage(response)
+    return response.choices[0].message.content
+
+def parse_batch_sqls(answer, size):
+    """배치 응답 [{"id", "sql"}, ...]에서 id → SQL 매핑 반환 (id가 0..size-1과 정확히 일치하지 않으면 None)"""
+    items = json.loads(strip_sql_code_block(answer))
+    if not isinstance(items, list) or len(items) != size:
+        return None
+
+    sqls = {}
+    for item in items:
+        if not isinstance(item, dict):
+            return None
+        item_id, sql = item.get("id"), item.get("sql")
+        if type(item_id) is not int or not isinstance(sql, str) or item_id in sqls:
+            return None
+        sqls[item_id] = sql
+
+    return sqls if set(sqls) == set(range(size)) else None
+
+def run_sql_batch(system_prompt, batch):
+    """배치로 모인 질문들에 대해 SQL 생성 (1개면 단건 호출)
+
+    배치 호출이 실패하거나 응답을 해석할 수 없으면 sql을 비워 두고, 각 요청 스레드가 단건 호출로 재시도
+    """
+    try:
+        if len(batch) == 1:
+            req = batch[0]
+            req.sql = strip_sql_code_block(request_sql_completion(system_prompt, req.user_question))
+            return
+
+        # 질문을 JSON 문자열로 전달해 질문 내용이 목록 구조를 바꾸지 못하게 하고, 응답은 id로 매칭
+        questions = json.dumps(
+            [{"id": i, "question": req.user_question} for i, req in enumerate(batch)],
+            ensure_ascii=False
+        )
+        user_content = f"""다음 JSON 배열의 각 question을 SQL로 변환하세요.
+각 항목의 id를 그대로 사용해 [{{"id": <id>, "sql": "<SQL>"}}, ...] 형식의 JSON 배열만 출력하세요.
+
+{questions}"""
+        try:
+            answer = request_sql_completion(system_prompt, user_content,
+                                            max_tokens=SQL_COMPLETION_TOKENS * len(batch))
+        except Exception as e:
+            # 배치 때문에만 생길 수 있는 실패(컨텍스트 길이, rate limit 등)로 모두를 실패시키지 않음
+            print(f"⚠️ 배치 호출 실패, 단건 호출로 재시도 ({len(batch)}개): {e}")
+            return
+
+        try:
+            sqls = parse_batch_sqls(answer, len(batch))
+        except ValueError as e:
+            print(f"⚠️ 배치 응답 파싱 실패, 단건 호출로 재시도: {e}")
+            return
+        if sqls is None:
+            print(f"⚠️ 배치 응답 형식 불일치, 단건 호출로 재시도 ({len(batch)}개)")
+            return
+
+        for i, req in enumerate(batch):
+            req.sql = strip_sql_code_block(sqls[i])
+    except Exception as e:
+        for req in batch:
+            req.error = e
+    finally:
+        for req in batch:
+            req.done.set()
+
+# SQL 생성 system 프롬프트 (고정 부분은 모듈 로드 시 1회 정의, 컬럼 정보만 요청별 삽입)
+# 모든 요청에 공통인 규칙/예시를 앞에, intent별로 고정인 컬럼 정보를 뒤에 두어
+# 프롬프트 앞부분이 요청 간 동일하게 유지되도록 함 (OpenAI 자동 프롬프트 캐싱 대상)
+# 질문은 항상 user 메시지로 전달
+SQL_SYSTEM_PROMPT = """당신은 MIMIC-IV 의료 데이터베이스의 SQL 전문가입니다.
 
 규칙:
 1. Oracle SQL 문법 사용
 2. 테이블명에 MIMICIV. 스키마 접두사 사용
-3. ROWNUM으로 결과 제한
+3. 결과 제한은 ROWNUM 대신 FETCH FIRST n ROWS ONLY 사용 (정렬 시 ORDER BY 뒤에)
 4. 안전한 쿼리만 생성 (SELECT만 허용)
 5. 한글 질문을 정확한 SQL로 변환
 
 예시:
 질문: "심부전 환자 5명 보여줘"
-SQL: SELECT * FROM MIMICIV.PATIENTS WHERE ROWNUM <= 5"""
-
-        response = openai.ChatCompletion.create(
-            model="gpt-4",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_question}
-            ],
-            temperature=0.3,
-            max_tokens=500
-        )
+SQL: SELECT * FROM MIMICIV.PATIENTS FETCH FIRST 5 ROWS ONLY
+
+사용 가능한 컬럼 정보:
+{column_context}"""
+
+def generate_sql_with_gpt(user_question, selected_columns=None):
+    """GPT-4를 사용하여 자연어를 SQL로 변환"""
+    global _active_sql_calls
+    
+    try:
+        # 컬럼 정보 가져오기 (선택 컬럼이 없으면 질문 intent 관련 테이블만)
+        if selected_columns:
+            column_context = "\n".join(selected_columns)
+        else:
+            column_context = get_column_context(infer_intent(user_question))
+        
+        system_prompt = SQL_SYSTEM_PROMPT.format(column_context=column_context)
+        system_tokens = estimate_prompt_tokens(system_prompt)
+
+        req = SQLGenerationRequest(user_question)
         
-        sql_query = response.choices[0].message.content.strip()
+        # 대기 중인 배치에 합류하거나, 없으면(가득 찼거나 컨텍스트 창을 넘으면) 새 배치의 리더가 됨
+        with _batch_lock:
+            batch = _pending_batches.get(system_prompt)
+            is_leader = (batch is None or len(batch) >= SQL_BATCH_MAX
+                         or not batch_fits_context(system_tokens, batch + [req]))
+            if is_leader:
+                batch = []
+                _pending_batches[system_prompt] = batch
+                # 다른 GPT 호출이 진행 중일 때(동시 요청이 있을 때)만 배치 윈도우 대기
+                wait_for_batch = _active_sql_calls > 0
+            batch.append(req)
         
-        # SQL 코드 블록 제거
-        if "```sql" in sql_query:
-            sql_query = sql_query.split("```sql")[1].split("```")[0].strip()
-        elif "```" in sql_query:
-            sql_query = sql_query.split("```")[1].split("```")[0].strip()
+        if is_leader:
+            if wait_for_batch:
+                time.sleep(SQL_BATCH_WINDOW)
+            with _batch_lock:
+                if _pending_batches.get(system_prompt) is batch:
+                    del _pending_batches[system_prompt]
+                _active_sql_calls += 1
+            try:
+                run_sql_batch(system_prompt, batch)
+            finally:
+                with _batch_lock:
+                    _active_sql_calls -= 1
         
-        return sql_query
+        req.done.wait()
+        if req.error:
+            raise req.error
+        
+        if req.sql is None:
+            # 배치 응답을 해석하지 못함 → 요청 스레드마다 병렬로 단건 호출
+            req.sql = strip_sql_code_block(request_sql_completion(system_prompt, user_question))
+        
+        return req.sql
         
     except Exception as e:
         print(f"❌ SQL 생성 실패: {e}")
         raise
 
+# /chat 결과 최대 행 수
+PREVIEW_ROW_LIMIT = 100
+# 생성 SQL 1회 실행 제한 시간 (ms, 0이면 제한 없음)
+SQL_CALL_TIMEOUT_MS = int(os.getenv('SQL_CALL_TIMEOUT_MS', '5000'))
+
+def json_output_type_handler(cursor, name, default_type, size, precision, scale):
+    """JSON 직렬화 가능한 타입으로 드라이버 단계에서 변환 (NUMBER → float, CLOB → str)"""
+    if default_type == cx_Oracle.DB_TYPE_NUMBER:
+        return cursor.var(float, arraysize=cursor.arraysize)
+    # LOB 객체는 직렬화 불가 + 행마다 추가 왕복이 생기므로 문자열로 바로 가져옴
+    if default_type == cx_Oracle.DB_TYPE_CLOB:
+        return cursor.var(cx_Oracle.DB_TYPE_LONG, arraysize=cursor.arraysize)
+    if default_type == cx_Oracle.DB_TYPE_NCLOB:
+        return cursor.var(cx_Oracle.DB_TYPE_LONG_NVARCHAR, arraysize=cursor.arraysize)
+
+def to_isoformat(value):
+    """날짜/시각 값을 ISO 문자열로 변환"""
+    return value.isoformat() if value is not None else None
+
+def build_row_converters(description):
+    """cursor.description으로 컬럼별 변환 함수 목록 생성 (변환 불필요 컬럼은 제외)
+
+    Returns:
+        [(컬럼 인덱스, 변환 함수), ...]
+    """
+    # NUMBER/CLOB은 json_output_type_handler에서 이미 float/str로 변환됨
+    return [
+        (i, to_isoformat)
+        for i, desc in enumerate(description)
+        if desc[1] == cx_Oracle.DATETIME
+    ]
+
+# 정렬 쿼리 top-N 판별용
+SQL_STRING_LITERAL_RE = re.compile(r"'(?:[^']|'')*'")
+ORDER_BY_RE = re.compile(r"\bORDER\s+BY\b", re.IGNORECASE)
+ROW_LIMIT_RE = re.compile(r"\bROWNUM\b|\bFETCH\s+(?:FIRST|NEXT)\b", re.IGNORECASE)
+
+def limit_sorted_query(sql_query, limit=PREVIEW_ROW_LIMIT):
+    """최상위 ORDER BY가 있고 행 제한이 없으면 FETCH FIRST를 붙여 top-N 정렬(STOPKEY) 유도
+
+    ROWNUM이 있는 쿼리는 정렬 전에 행을 거르는 의미가 달라지므로 그대로 둠
+    (SQL_SYSTEM_PROMPT가 ROWNUM 대신 ORDER BY ... FETCH FIRST를 쓰도록 안내)
+    """
+    sql = sql_query.strip().rstrip(';').rstrip()
+    # 문자열 리터럴 내부의 괄호/키워드는 무시
+    masked = SQL_STRING_LITERAL_RE.sub(lambda m: "'" + ' ' * (len(m.group(0)) - 2) + "'", sql)
+    
+    if ROW_LIMIT_RE.search(masked):
+        return sql_query
+    
+    order_by = None
+    for order_by in ORDER_BY_RE.finditer(masked):
+        pass
+    if order_by is None:
+        return sql_query
+    
+    # 마지막 ORDER BY가 서브쿼리 안이면 재작성하지 않음
+    prefix = masked[:order_by.start()]
+    if prefix.count('(') != prefix.count(')'):
+        return sql_query
+    
+    # 마지막 줄이 -- 주석이어도 절이 주석에 묻히지 않도록 새 줄에 추가
+    return f"{sql}\nFETCH FIRST {limit} ROWS ONLY"
+
 def execute_sql_query(sql_query):
     """SQL 쿼리 실행 및 결과 반환"""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
         # SELECT만 허용
         if not sql_query.strip().upper().startswith('SELECT'):
             raise ValueError("SELECT 쿼리만 실행 가능합니다")
         
-        cursor.execute(sql_query)
-        
-        # 컬럼명 가져오기
-        columns = [desc[0] for desc in cursor.description]
-        
-        # 결과 가져오기 (최대 100개)
-        rows = cursor.fetchmany(100)
-        
-        cursor.close()
-        conn.close()
+        conn = get_db_connection()
+        try:
+            # 잘못 생성된 SQL이 워커를 오래 점유하지 않도록 DB 호출 시간 제한
+            conn.call_timeout = SQL_CALL_TIMEOUT_MS
+            cursor = conn.cursor()
+            
+            # 최대 100행을 execute 왕복 1회로 가져오도록 fetch 크기 조정
+            cursor.arraysize = PREVIEW_ROW_LIMIT
+            cursor.prefetchrows = PREVIEW_ROW_LIMIT + 1
+            cursor.outputtypehandler = json_output_type_handler
+            # 100행만 반환하므로 정렬 쿼리는 DB에서 상위 N개만 정렬
+            cursor.execute(limit_sorted_query(sql_query))
+            
+            # 컬럼명 및 컬럼별 변환 함수 (행마다 타입 검사하지 않도록 1회 계산)
+            columns = [desc[0] for desc in cursor.description]
+            converters = build_row_converters(cursor.description)
+            
+            # 결과 가져오기 (최대 100개)
+            rows = cursor.fetchmany(PREVIEW_ROW_LIMIT)
+            
+            cursor.close()
+        except cx_Oracle.DatabaseError as e:
+            if 'DPI-1067' in str(e):
+                raise TimeoutError(f"쿼리 실행 시간이 초과되었습니다 ({SQL_CALL_TIMEOUT_MS}ms)") from e
+            raise
+        finally:
+            # 풀의 다른 용도(메타데이터 조회 등)에는 제한이 남지 않도록 초기화
+            conn.call_timeout = 0
+            release_db_connection(conn)
         
-        # JSON 직렬화 가능한 형태로 변환
-        results = []
-        for row in rows:
-            row_dict = {}
-            for i, col in enumerate(columns):
-                value = row[i]
-                # datetime 객체 처리
-                if hasattr(value, 'isoformat'):
-                    value = value.isoformat()
-                # Decimal 처리
-                elif hasattr(value, '__float__'):
-                    value = float(value)
-                row_dict[col] = value
-            results.append(row_dict)
+        # 컬럼 지향 형태로 변환 (행마다 컬럼명을 반복하지 않음)
+        results = [list(row) for row in rows]
+        for row in results:
+            for i, convert in converters:
+                row[i] = convert(row[i])
         
         return {
             'columns': columns,
@@ -237,21 +830,144 @@ def execute_sql_query(sql_query):
         print(f"❌ SQL 실행 실패: {e}")
         raise
 
+# ============= SQL 결과 캐시 =============
+# MIMIC-IV는 읽기 전용이므로 같은 SQL은 같은 결과 → SQL 문자열 기준으로 재사용
+RESULT_CACHE_TTL = int(os.getenv('RESULT_CACHE_TTL', '3600'))
+RESULT_CACHE_SIZE = int(os.getenv('RESULT_CACHE_SIZE', '256'))
+
+_result_cache = OrderedDict()
+_result_cache_lock = threading.Lock()
+
+def make_result_cache_key(sql_query):
+    """SQL 해시 (앞뒤 공백/세미콜론만 제거)
+
+    문자열 리터럴('Heparin' vs 'heparin')과 따옴표 식별자는 대소문자/공백이 결과를 바꾸므로 정규화하지 않음
+    """
+    normalized = sql_query.strip().rstrip(';').rstrip()
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+def execute_sql_query_cached(sql_query):
+    """캐시 적중 시 DB 실행 생략. (결과, 적중 여부) 반환"""
+    key = make_result_cache_key(sql_query)
+    now = time.time()
+    
+    with _result_cache_lock:
+        entry = _result_cache.get(key)
+        if entry and now - entry[0] < RESULT_CACHE_TTL:
+            _result_cache.move_to_end(key)
+            return entry[1], True
+    
+    result = execute_sql_query(sql_query)
+    
+    with _result_cache_lock:
+        _result_cache[key] = (now, result)
+        _result_cache.move_to_end(key)
+        while len(_result_cache) > RESULT_CACHE_SIZE:
+            _result_cache.popitem(last=False)
+    
+    return result, False
+
+# ============= 동일 질문 동시 요청 병합 =============
+# 같은 질문이 동시에 들어오면 첫 요청만 GPT/DB를 호출하고 나머지는 결과를 공유
+SINGLEFLIGHT_TIMEOUT = float(os.getenv('SINGLEFLIGHT_TIMEOUT', '60'))
+
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+def run_singleflight(key, func, *args):
+    """key별로 진행 중인 호출이 있으면 그 결과를 기다리고, 없으면 직접 실행"""
+    with _inflight_lock:
+        future = _inflight.get(key)
+        is_owner = future is None
+        if is_owner:
+            future = Future()
+            _inflight[key] = future
+    
+    if not is_owner:
+        return future.result(timeout=SINGLEFLIGHT_TIMEOUT)
+    
+    try:
+        value = func(*args)
+        future.set_result(value)
+        return value
+    except Exception as e:
+        future.set_exception(e)
+        raise
+    finally:
+        with _inflight_lock:
+            _inflight.pop(key, None)
+
+def answer_question(cache_key, user_message, selected_columns):
+    """SQL 생성(캐시 우선) 후 실행. (sql, 결과, SQL 캐시 적중, 결과 캐시 적중) 반환"""
+    # 1. SQL 생성 (캐시 적중 시 GPT 호출 생략)
+    sql_query = get_cached_sql(cache_key)
+    cache_hit = sql_query is not None
+    if not cache_hit:
+        sql_query = generate_sql_with_gpt(user_message, selected_columns)
+    
+    # 2. SQL 실행 (동일 SQL 결과는 캐시 재사용)
+    try:
+        result, result_cache_hit = execute_sql_query_cached(sql_query)
+    except Exception as e:
+        if not cache_hit:
+            raise
+        # 캐시된 SQL이 실행되지 않으면 제거 후 1회만 새로 생성
+        print(f"⚠️ 캐시된 SQL 실행 실패, 재생성: {e}")
+        evict_cached_sql(cache_key)
+        cache_hit = False
+        sql_query = generate_sql_with_gpt(user_message, selected_columns)
+        result, result_cache_hit = execute_sql_query_cached(sql_query)
+    
+    # 실행 성공한 SQL만 캐시
+    if not cache_hit:
+        cache_sql(cache_key, user_message, sql_query)
+    
+    return sql_query, result, cache_hit, result_cache_hit
+
 # ============= API 엔드포인트 =============
 
+def read_json_body():
+    """요청 본문을 app.json(orjson)으로 파싱 (request에 본문 사본을 캐시하지 않음)"""
+    return app.json.loads(request.get_data(cache=False))
+
+# 헬스체크 결과 캐시 (Railway probe마다 DB 왕복하지 않도록)
+HEALTH_CACHE_TTL = float(os.getenv('HEALTH_CACHE_TTL', '5'))
+_health_cache = {"ts": 0.0}
+_health_lock = threading.Lock()
+
+def check_database():
+    """최근 성공 후 TTL 이내면 DB 확인 생략, 아니면 SELECT 1 FROM DUAL"""
+    if time.time() - _health_cache["ts"] < HEALTH_CACHE_TTL:
+        return
+    
+    with _health_lock:
+        # 대기 중 다른 스레드가 이미 확인했으면 재사용
+        if time.time() - _health_cache["ts"] < HEALTH_CACHE_TTL:
+            return
+        
+        conn = get_db_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1 FROM DUAL")
+            cursor.close()
+        finally:
+            release_db_connection(conn)
+        
+        _health_cache["ts"] = time.time()
+
 @app.route('/health', methods=['GET'])
 def health_check():
     """헬스체크 엔드포인트"""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT 1 FROM DUAL")
-        cursor.close()
-        conn.close()
+        check_database()
+        
+        with _prompt_cache_stats_lock:
+            prompt_cache = dict(_prompt_cache_stats)
         
         return jsonify({
             "status": "healthy",
             "database": "connected",
+            "prompt_cache": prompt_cache,
             "timestamp": datetime.now().isoformat()
         }), 200
     except Exception as e:
@@ -266,25 +982,27 @@ def health_check():
 def chat():
     """자연어 질의를 SQL로 변환하고 실행"""
     try:
-        data = request.get_json()
+        data = read_json_body()
         user_message = data.get('message', '')
         selected_columns = data.get('selected_columns', None)
         
         if not user_message:
             return jsonify({'error': '메시지를 입력해주세요'}), 400
         
-        # 1. SQL 생성
-        sql_query = generate_sql_with_gpt(user_message, selected_columns)
-        
-        # 2. SQL 실행
-        result = execute_sql_query(sql_query)
+        cache_key = make_sql_cache_key(user_message, selected_columns)
+        sql_query, result, cache_hit, result_cache_hit = run_singleflight(
+            cache_key, answer_question, cache_key, user_message, selected_columns
+        )
         
-        return jsonify({
+        response = jsonify({
             'success': True,
             'sql': sql_query,
+            'cached': cache_hit,
             'result': result,
             'message': f"{result['count']}개의 결과를 찾았습니다."
         })
+        response.headers['X-Cache'] = 'HIT' if result_cache_hit else 'MISS'
+        return response
         
     except Exception as e:
         return jsonify({
@@ -308,27 +1026,38 @@ def get_columns():
             'error': str(e)
         }), 500
 
+# 관리용 엔드포인트 토큰 (미설정 시 관리용 엔드포인트 비활성화)
+ADMIN_TOKEN = os.getenv('ADMIN_TOKEN', '')
+
+def is_admin_request():
+    """X-Admin-Token 헤더가 ADMIN_TOKEN과 일치하는지 확인"""
+    token = request.headers.get('X-Admin-Token', '')
+    return bool(ADMIN_TOKEN) and hmac.compare_digest(token.encode('utf-8'), ADMIN_TOKEN.encode('utf-8'))
+
+@app.route('/columns/invalidate', methods=['POST'])
+def invalidate_columns():
+    """테이블/컬럼 메타데이터 캐시 초기화 (관리자 전용)"""
+    if not is_admin_request():
+        return jsonify({
+            'success': False,
+            'error': '권한이 없습니다'
+        }), 403
+    
+    invalidate_metadata_cache()
+    return jsonify({
+        'success': True,
+        'message': '메타데이터 캐시가 초기화되었습니다.'
+    })
+
 @app.route('/tables', methods=['GET'])
 def get_tables():
     """전체 테이블 목록 조회"""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            SELECT table_name, num_rows
-            FROM all_tables
-            WHERE owner = 'MIMICIV'
-            ORDER BY table_name
-        """)
-        
-        tables = cursor.fetchall()
-        cursor.close()
-        conn.close()
+        metadata = get_schema_metadata()
         
         table_list = [
-            {'name': t[0], 'rows': t[1] if t[1] else 0}
-            for t in tables
+            {'name': name, 'rows': table['rows']}
+            for name, table in metadata.items()
         ]
         
         return jsonify({
@@ -354,6 +1083,7 @@ def index():
             'health': '/health',
             'chat': '/chat (POST)',
             'columns': '/columns',
+            'columns_invalidate': '/columns/invalidate (POST)',
             'tables': '/tables'
         }
     })
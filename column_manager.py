@@ -5,13 +5,23 @@ import json
 import os
 from typing import Dict, List, Optional
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# 디버그 출력 여부 (COLUMN_DEBUG=true일 때만 설정/intent 내용 출력)
+COLUMN_DEBUG = os.getenv("COLUMN_DEBUG", "false").lower() == "true"
+
 
 class ColumnManager:
     def __init__(self, config_file="column_config.json", user_settings_file="user_column_settings.json"):
         self.config_file = config_file
         self.user_settings_file = user_settings_file
         self.base_columns = self._load_base_columns()
+        self._settings_mtime = self._get_settings_mtime()
         self.user_settings = self._load_user_settings()
+        self._instruction_cache = {}  # intent → 컬럼 지시문 (설정 변경 시 초기화)
 
     def _load_base_columns(self) -> Dict:
         """기본 컬럼셋 정의 - 5개 카테고리별 필수 컬럼들"""
@@ -73,25 +83,51 @@ class ColumnManager:
     def _load_user_settings(self) -> Dict:
         """사용자 설정 파일에서 로드"""
         try:
-            with open(self.user_settings_file, 'r', encoding='utf-8') as f:
-                settings = json.load(f)
-                print(f"🔍 [COLUMN_DEBUG] 사용자 설정 로드 성공: {settings}")  # 추가
+            with open(self.user_settings_file, 'rb') as f:
+                raw = f.read()
+                settings = orjson.loads(raw) if orjson is not None else json.loads(raw)
+                if COLUMN_DEBUG:
+                    print(f"🔍 [COLUMN_DEBUG] 사용자 설정 로드 성공: {settings}")
                 return settings
         except FileNotFoundError:
-            print(f"🔍 [COLUMN_DEBUG] 설정 파일 없음: {self.user_settings_file}")  # 추가
+            if COLUMN_DEBUG:
+                print(f"🔍 [COLUMN_DEBUG] 설정 파일 없음: {self.user_settings_file}")
             return {}
         except:
-            print(f"🔍 [COLUMN_DEBUG] 설정 파일 로드 실패")  # 추가
+            if COLUMN_DEBUG:
+                print(f"🔍 [COLUMN_DEBUG] 설정 파일 로드 실패")
             pass
         return {}
 
+    def _get_settings_mtime(self) -> Optional[float]:
+        """설정 파일 수정 시각 (파일 없으면 None)"""
+        try:
+            return os.path.getmtime(self.user_settings_file)
+        except OSError:
+            return None
+
+    def _refresh_user_settings(self):
+        """설정 파일이 바뀐 경우에만 다시 로드 (다른 워커의 저장 반영)"""
+        mtime = self._get_settings_mtime()
+        if mtime != self._settings_mtime:
+            self._settings_mtime = mtime
+            self.user_settings = self._load_user_settings()
+            self._instruction_cache = {}
+
     def save_user_settings(self, settings: Dict):
         """사용자 설정 저장"""
         try:
-            with open(self.user_settings_file, 'w', encoding='utf-8') as f:
-                json.dump(settings, f, ensure_ascii=False, indent=2)
+            if orjson is not None:
+                data = orjson.dumps(settings, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+            else:
+                data = json.dumps(settings, ensure_ascii=False, indent=2).encode('utf-8')
+            with open(self.user_settings_file, 'wb') as f:
+                f.write(data)
             self.user_settings = settings
-            print(f"🔍 [COLUMN_DEBUG] 메모리 업데이트 완료: {self.user_settings}")  # 디버깅
+            self._settings_mtime = self._get_settings_mtime()
+            self._instruction_cache = {}
+            if COLUMN_DEBUG:
+                print(f"🔍 [COLUMN_DEBUG] 메모리 업데이트 완료: {self.user_settings}")  # 디버깅
             return True
         except Exception as e:
             print(f"설정 저장 실패: {e}")
@@ -99,12 +135,14 @@ class ColumnManager:
 
     def get_columns_for_intent(self, intent: str) -> Dict:
         """특정 intent에 대한 컬럼 정보 반환"""
-        print(f"🔍 [COLUMN_DEBUG] Intent 요청: '{intent}'")  # 추가
-        print(f"🔍 [COLUMN_DEBUG] 사용 가능한 intents: {list(self.base_columns.keys())}")  # 추가
+        if COLUMN_DEBUG:
+            print(f"🔍 [COLUMN_DEBUG] Intent 요청: '{intent}'")
+            print(f"🔍 [COLUMN_DEBUG] 사용 가능한 intents: {list(self.base_columns.keys())}")
 
         base_config = self.base_columns.get(intent, self.base_columns.get("환자/입원", {}))
         user_config = self.user_settings.get(intent, {})
-        print(f"🔍 [COLUMN_DEBUG] User config for '{intent}': {user_config}")  # 추가
+        if COLUMN_DEBUG:
+            print(f"🔍 [COLUMN_DEBUG] User config for '{intent}': {user_config}")
 
         result = {
             "essential": base_config.get("essential", []),
@@ -119,9 +157,17 @@ class ColumnManager:
         return list(self.base_columns.keys())
 
     def generate_column_instruction(self, intent: str) -> str:
-        """LLM에 전달할 컬럼 강제 지시문 생성"""
-        self.user_settings = self._load_user_settings()
+        """LLM에 전달할 컬럼 강제 지시문 생성 (설정이 바뀌기 전까지 intent별 재사용)"""
+        self._refresh_user_settings()
+        if intent in self._instruction_cache:
+            return self._instruction_cache[intent]
+
+        instruction = self._build_column_instruction(intent)
+        self._instruction_cache[intent] = instruction
+        return instruction
 
+    def _build_column_instruction(self, intent: str) -> str:
+        """컬럼 강제 지시문 문자열 생성"""
         column_info = self.get_columns_for_intent(intent)
 
         essential_cols = column_info["essential"]
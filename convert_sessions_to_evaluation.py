@@ -13,75 +13,128 @@ import json
 import os
 from datetime import datetime
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
-def extract_sqls_from_sessions(json_file="multiturn_sessions.json", gold_file="gold.txt", predict_file="predict.txt"):
-    """multiturn_sessions.json에서 SQL 쌍을 추출해서 gold.txt와 predict.txt 생성"""
+try:
+    import ijson
+except ImportError:
+    ijson = None
 
-    if not os.path.exists(json_file):
+# 이 크기(MB)를 넘는 세션 파일은 ijson으로 세션 단위 스트리밍 (ijson 설치 시)
+SESSIONS_STREAM_THRESHOLD_MB = int(os.getenv('SESSIONS_STREAM_THRESHOLD_MB', '20'))
+
+
+def load_sessions_json(json_file):
+    """세션 JSON 파일 로드 (orjson이 있으면 바이트로 읽어 파싱)"""
+    with open(json_file, 'rb') as f:
+        raw = f.read()
+    return orjson.loads(raw) if orjson is not None else json.loads(raw)
+
+
+def should_stream_sessions(json_file):
+    """대용량 세션 파일이면 전체 파싱 대신 스트리밍"""
+    return ijson is not None and os.path.getsize(json_file) > SESSIONS_STREAM_THRESHOLD_MB * 1024 * 1024
+
+
+def iter_sessions(json_file, data=None):
+    """multiturn_sessions 항목을 하나씩 반환 (data가 있으면 그대로, 대용량 파일은 ijson 스트리밍)"""
+    if data is not None:
+        yield from data.get('multiturn_sessions', [])
+        return
+
+    if should_stream_sessions(json_file):
+        with open(json_file, 'rb') as f:
+            yield from ijson.items(f, 'multiturn_sessions.item', use_float=True)
+        return
+
+    yield from load_sessions_json(json_file).get('multiturn_sessions', [])
+
+
+def collapse_whitespace(sql):
+    """멀티라인 SQL을 한 줄로 변환 (str.split/join이 re.sub보다 빠름)"""
+    return ' '.join(sql.split())
+
+
+def extract_sqls_from_sessions(json_file="multiturn_sessions.json", gold_file="gold.txt", predict_file="predict.txt",
+                               data=None):
+    """multiturn_sessions.json에서 SQL 쌍을 추출해서 gold.txt와 predict.txt 생성 (data가 있으면 재파싱 생략)"""
+
+    if data is None and not os.path.exists(json_file):
         print(f"❌ 파일이 존재하지 않습니다: {json_file}")
         return False
 
     try:
-        # JSON 파일 읽기
-        with open(json_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        # gold/predict 라인을 모아서 파일당 한 번에 기록
+        gold_parts = []
+        pred_parts = []
+        session_count = 0
+        completed_count = 0
+        total_turns = 0
+        need_separator = False
 
-        sessions = data.get('multiturn_sessions', [])
-        if not sessions:
-            print("❌ multiturn_sessions가 비어있습니다")
-            return False
+        # 세션을 하나씩 받아 완료된 세션만 처리
+        for session in iter_sessions(json_file, data):
+            session_count += 1
+            if session.get('status') != '완료':
+                continue
 
-        print(f"📊 총 {len(sessions)}개 세션 발견")
+            completed_count += 1
+            session_id = session.get('session_id', f'Session_{completed_count}')
+            turns = session.get('turns', [])
+            total_turns += len(turns)
 
-        # 완료된 세션만 필터링
-        completed_sessions = [s for s in sessions if s.get('status') == '완료']
-        print(f"✅ 완료된 세션: {len(completed_sessions)}개")
+            if not turns:
+                print(f"⚠️ {session_id}: 턴이 없음, 건너뜀")
+                continue
 
-        if not completed_sessions:
-            print("❌ 완료된 세션이 없습니다")
-            return False
+            print(f"📝 {session_id}: {len(turns)}개 턴 처리")
 
-        # gold.txt와 predict.txt 파일 생성
-        with open(gold_file, 'w', encoding='utf-8') as gold_f, \
-                open(predict_file, 'w', encoding='utf-8') as pred_f:
+            # 세션 간 구분용 공백줄 (기록된 세션 사이에만)
+            if need_separator:
+                gold_parts.append("\n")
+                pred_parts.append("\n")
+            need_separator = True
 
-            for session_idx, session in enumerate(completed_sessions):
-                session_id = session.get('session_id', f'Session_{session_idx + 1}')
-                turns = session.get('turns', [])
+            # 각 세션의 턴들을 줄바꿈으로 연결
+            for turn in turns:
+                target_sql = turn.get('target_sql', '').strip()
+                generated_sql = turn.get('generated_sql', '').strip()
 
-                if not turns:
-                    print(f"⚠️ {session_id}: 턴이 없음, 건너뜀")
-                    continue
+                if target_sql and generated_sql:
+                    # 멀티라인 SQL을 한 줄로 변환
+                    target_sql_clean = collapse_whitespace(target_sql)
+                    generated_sql_clean = collapse_whitespace(generated_sql)
 
-                print(f"📝 {session_id}: {len(turns)}개 턴 처리")
+                    gold_parts.append(f"{target_sql_clean}\tmimic_iv\n")
+                    pred_parts.append(f"{generated_sql_clean}\tmimic_iv\n")
+                else:
+                    print(f"⚠️ {session_id} 턴 {turn.get('turn_number', '?')}: SQL 누락")
 
-                # 각 세션의 턴들을 줄바꿈으로 연결
-                for turn in turns:
-                    target_sql = turn.get('target_sql', '').strip()
-                    generated_sql = turn.get('generated_sql', '').strip()
+        if not session_count:
+            print("❌ multiturn_sessions가 비어있습니다")
+            return False
 
-                    if target_sql and generated_sql:
-                        # 멀티라인 SQL을 한 줄로 변환
-                        target_sql_clean = ' '.join(target_sql.split())
-                        generated_sql_clean = ' '.join(generated_sql.split())
+        print(f"📊 총 {session_count}개 세션 발견")
+        print(f"✅ 완료된 세션: {completed_count}개")
 
-                        # gold.txt와 predict.txt에 각각 저장
-                        gold_f.write(f"{target_sql_clean}\tmimic_iv\n")
-                        pred_f.write(f"{generated_sql_clean}\tmimic_iv\n")
-                    else:
-                        print(f"⚠️ {session_id} 턴 {turn.get('turn_number', '?')}: SQL 누락")
+        if not completed_count:
+            print("❌ 완료된 세션이 없습니다")
+            return False
 
-                # 세션 간 구분용 공백줄 (마지막 세션 제외)
-                if session_idx < len(completed_sessions) - 1:
-                    gold_f.write("\n")
-                    pred_f.write("\n")
+        # gold.txt와 predict.txt 파일 생성
+        with open(gold_file, 'w', encoding='utf-8') as gold_f:
+            gold_f.write(''.join(gold_parts))
+        with open(predict_file, 'w', encoding='utf-8') as pred_f:
+            pred_f.write(''.join(pred_parts))
 
         # 결과 통계
-        total_turns = sum(len(session.get('turns', [])) for session in completed_sessions)
         print(f"✅ 변환 완료!")
         print(f"📄 {gold_file}: 정답 SQL")
         print(f"📄 {predict_file}: 생성 SQL")
-        print(f"📊 총 {total_turns}개 쿼리, {len(completed_sessions)}개 세션")
+        print(f"📊 총 {total_turns}개 쿼리, {completed_count}개 세션")
 
         return True
 
@@ -92,20 +145,14 @@ def extract_sqls_from_sessions(json_file="multiturn_sessions.json", gold_file="g
         return False
 
 
-def show_session_summary(json_file="multiturn_sessions.json"):
-    """세션별 요약 정보 출력"""
+def show_session_summary(json_file="multiturn_sessions.json", data=None):
+    """세션별 요약 정보 출력 (data가 있으면 재파싱 생략)"""
 
-    if not os.path.exists(json_file):
+    if data is None and not os.path.exists(json_file):
         print(f"❌ 파일이 존재하지 않습니다: {json_file}")
         return
 
     try:
-        with open(json_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-
-        sessions = data.get('multiturn_sessions', [])
-        completed_sessions = [s for s in sessions if s.get('status') == '완료']
-
         print("=" * 80)
         print("📊 멀티턴 세션 요약")
         print("=" * 80)
@@ -113,14 +160,23 @@ def show_session_summary(json_file="multiturn_sessions.json"):
         total_turns = 0
         total_exact_matches = 0
         total_execution_matches = 0
+        completed_count = 0
+
+        for session in iter_sessions(json_file, data):
+            if session.get('status') != '완료':
+                continue
 
-        for i, session in enumerate(completed_sessions):
-            session_id = session.get('session_id', f'Session_{i + 1}')
+            completed_count += 1
+            session_id = session.get('session_id', f'Session_{completed_count}')
             turns = session.get('turns', [])
 
-            # 세션 통계
-            exact_matches = sum(1 for turn in turns if turn.get('exact_match') == True)
-            exec_matches = sum(1 for turn in turns if turn.get('execution_match') == True)
+            # 세션 통계 (턴 목록을 한 번만 순회)
+            exact_matches = exec_matches = 0
+            for turn in turns:
+                if turn.get('exact_match') is True:
+                    exact_matches += 1
+                if turn.get('execution_match') is True:
+                    exec_matches += 1
             total_tokens = session.get('total_tokens', 0)
 
             created_at = session.get('created_at', '')
@@ -142,7 +198,7 @@ def show_session_summary(json_file="multiturn_sessions.json"):
 
         # 전체 통계
         print("📋 전체 요약:")
-        print(f"   • 완료 세션: {len(completed_sessions)}개")
+        print(f"   • 완료 세션: {completed_count}개")
         print(f"   • 전체 턴: {total_turns}개")
         print(
             f"   • 전체 Exact Match: {total_exact_matches}/{total_turns} ({total_exact_matches / total_turns * 100:.1f}%)")
@@ -154,6 +210,11 @@ def show_session_summary(json_file="multiturn_sessions.json"):
         print(f"❌ 요약 생성 실패: {e}")
 
 
+def count_lines(raw):
+    """readlines()와 같은 기준으로 줄 수 계산 (마지막 줄에 개행이 없어도 1줄)"""
+    return raw.count(b'\n') + (1 if raw and not raw.endswith(b'\n') else 0)
+
+
 def validate_files(gold_file="gold.txt", predict_file="predict.txt"):
     """생성된 파일들의 유효성 검사"""
 
@@ -169,31 +230,36 @@ def validate_files(gold_file="gold.txt", predict_file="predict.txt"):
             print(f"❌ {predict_file} 파일이 없습니다")
             return False
 
-        # 라인 수 확인
-        with open(gold_file, 'r', encoding='utf-8') as f:
-            gold_lines = f.readlines()
+        # 라인 수 확인 (바이트로 읽어 줄 리스트 없이 개행만 셈)
+        with open(gold_file, 'rb') as f:
+            gold_bytes = f.read()
 
-        with open(predict_file, 'r', encoding='utf-8') as f:
-            pred_lines = f.readlines()
+        with open(predict_file, 'rb') as f:
+            pred_bytes = f.read()
 
-        print(f"📄 {gold_file}: {len(gold_lines)}줄")
-        print(f"📄 {predict_file}: {len(pred_lines)}줄")
+        gold_line_count = count_lines(gold_bytes)
+        pred_line_count = count_lines(pred_bytes)
 
-        if len(gold_lines) != len(pred_lines):
+        print(f"📄 {gold_file}: {gold_line_count}줄")
+        print(f"📄 {predict_file}: {pred_line_count}줄")
+
+        if gold_line_count != pred_line_count:
             print("⚠️ 파일의 라인 수가 다릅니다!")
             return False
 
         # 샘플 검증
-        non_empty_gold = [line for line in gold_lines if line.strip()]
-        non_empty_pred = [line for line in pred_lines if line.strip()]
+        non_empty_gold = sum(1 for line in gold_bytes.splitlines() if line.strip())
+        non_empty_pred = sum(1 for line in pred_bytes.splitlines() if line.strip())
 
-        print(f"📊 실제 쿼리: gold {len(non_empty_gold)}개, predict {len(non_empty_pred)}개")
+        print(f"📊 실제 쿼리: gold {non_empty_gold}개, predict {non_empty_pred}개")
 
         # 첫 번째 쿼리 예시 출력
         if non_empty_gold and non_empty_pred:
+            first_gold = next(line for line in gold_bytes.splitlines() if line.strip())
+            first_pred = next(line for line in pred_bytes.splitlines() if line.strip())
             print(f"\n📝 첫 번째 쿼리 예시:")
-            print(f"Gold: {non_empty_gold[0].strip()[:80]}...")
-            print(f"Pred: {non_empty_pred[0].strip()[:80]}...")
+            print(f"Gold: {first_gold.decode('utf-8', 'replace').strip()[:80]}...")
+            print(f"Pred: {first_pred.decode('utf-8', 'replace').strip()[:80]}...")
 
         print("✅ 파일 검증 완료!")
         return True
@@ -224,12 +290,21 @@ def main():
         validate_files(args.gold, args.predict)
         return
 
+    # JSON은 한 번만 파싱해서 요약/변환에 공유 (대용량 파일은 각자 스트리밍)
+    data = None
+    if os.path.exists(args.input) and not should_stream_sessions(args.input):
+        try:
+            data = load_sessions_json(args.input)
+        except Exception as e:
+            print(f"❌ JSON 파싱 실패: {e}")
+            return
+
     # 세션 요약 먼저 출력
-    show_session_summary(args.input)
+    show_session_summary(args.input, data=data)
     print()
 
     # 변환 실행
-    success = extract_sqls_from_sessions(args.input, args.gold, args.predict)
+    success = extract_sqls_from_sessions(args.input, args.gold, args.predict, data=data)
 
     if success:
         print()
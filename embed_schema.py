@@ -9,14 +9,109 @@ embed_schema_hybrid.py - 하이브리드 청킹 방식
 4. 도메인별 메타데이터 (의료 도메인 특성 반영)
 """
 
-from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_chroma import Chroma
 from langchain_core.documents import Document
+from dotenv import load_dotenv
 import re
 import os
 import json
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 
+load_dotenv()
+
+# 임베딩 백엔드 설정
+# - openai: OpenAI 임베딩 API 사용 (torch/모델 가중치 로딩 없음, 기본값)
+# - huggingface: 로컬 multilingual-e5-large (기존 chroma_db와 호환)
+# - infinity: infinity_emb 서버로 multilingual-e5-large 추론 (동적 배치, 기존 chroma_db와 호환)
+#   예) infinity_emb v2 --model-id intfloat/multilingual-e5-large --port 7997
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "openai")
+OPENAI_EMBEDDING_MODEL = os.getenv("OPENAI_EMBEDDING_MODEL", "text-embedding-3-small")
+# text-embedding-3 계열 출력 차원 축소 (예: 512 → 벡터 저장/HNSW 메모리 1/3, 0이면 모델 기본 차원)
+OPENAI_EMBEDDING_DIMENSIONS = int(os.getenv("OPENAI_EMBEDDING_DIMENSIONS", "0")) or None
+HF_EMBEDDING_MODEL = "intfloat/multilingual-e5-large"
+# huggingface 백엔드 장치 (auto: CUDA가 있으면 GPU + FP16) 및 인코딩 배치 크기
+HF_EMBEDDING_DEVICE = os.getenv("HF_EMBEDDING_DEVICE", "auto")
+HF_EMBEDDING_BATCH_SIZE = int(os.getenv("HF_EMBEDDING_BATCH_SIZE", "64"))
+INFINITY_API_URL = os.getenv("INFINITY_API_URL", "http://localhost:7997")
+
+# 스키마 파일 청킹 프로세스 수 (1이면 순차 처리)
+# 현재 스키마 파일은 작아서 프로세스 기동 비용이 더 크므로 기본값은 1
+SCHEMA_CHUNK_WORKERS = int(os.getenv("SCHEMA_CHUNK_WORKERS", "1"))
+
+# 청킹용 정규식 (모듈 로드 시 1회 컴파일)
+TABLE_SECTION_RE = re.compile(r'\n(?=[A-Z_]+\n)')
+MAIN_SECTION_RE = re.compile(r'\n## ')
+SUB_SECTION_RE = re.compile(r'\n### ')
+TABLE_NAME_RE = re.compile(r'^([A-Z_]+)')
+BOLD_HEADER_RE = re.compile(r'\n\*\*(.+?)\*\*')
+# FAQ 파싱: 줄 단위로 Q/A 시작과 답변 종료(Q, #, 번호 목록) 판별
+FAQ_QUESTION_RE = re.compile(r'Q[:：]\s*')
+FAQ_ANSWER_RE = re.compile(r'A[:：]\s*')
+FAQ_END_RE = re.compile(r'Q[:：]|#|\d+\.')
+
+
+def parse_faq_pairs(content):
+    """Q:/A: 형식의 FAQ를 (질문, 답변) 목록으로 추출 (줄 단위 선형 파싱)"""
+    pairs = []
+    question, answer = None, None
+
+    for line in content.split('\n'):
+        if answer is not None:
+            if not FAQ_END_RE.match(line):
+                answer.append(line)
+                continue
+            pairs.append(('\n'.join(question), '\n'.join(answer)))
+            question, answer = None, None
+
+        q_match = FAQ_QUESTION_RE.match(line)
+        if q_match:
+            question = [line[q_match.end():]]
+        elif question is not None:
+            a_match = FAQ_ANSWER_RE.match(line)
+            if a_match:
+                answer = [line[a_match.end():]]
+            else:
+                question.append(line)
+
+    if answer is not None:
+        pairs.append(('\n'.join(question), '\n'.join(answer)))
+    return pairs
+
+
+def get_embedding():
+    """설정된 백엔드의 임베딩 모델 생성"""
+    if EMBEDDING_BACKEND == "huggingface":
+        # torch + 약 2GB 모델 가중치가 필요하므로 선택 시에만 import
+        import torch
+        from langchain_huggingface import HuggingFaceEmbeddings
+
+        device = HF_EMBEDDING_DEVICE
+        if device == "auto":
+            device = "cuda" if torch.cuda.is_available() else "cpu"
+
+        model_kwargs = {'device': device}
+        if device.startswith("cuda"):
+            # GPU에서는 FP16 가중치로 메모리 대역폭 절반 (정규화된 벡터라 검색 품질 영향 미미)
+            model_kwargs['model_kwargs'] = {'torch_dtype': torch.float16}
+
+        return HuggingFaceEmbeddings(
+            model_name=HF_EMBEDDING_MODEL,
+            model_kwargs=model_kwargs,
+            encode_kwargs={'normalize_embeddings': True, 'batch_size': HF_EMBEDDING_BATCH_SIZE}
+        )
+
+    if EMBEDDING_BACKEND == "infinity":
+        # 모델 추론은 별도 서버에서 수행하므로 torch 로딩 없음
+        from langchain_community.embeddings import InfinityEmbeddings
+        return InfinityEmbeddings(
+            model=HF_EMBEDDING_MODEL,
+            infinity_api_url=INFINITY_API_URL
+        )
+
+    from langchain_openai import OpenAIEmbeddings
+    return OpenAIEmbeddings(model=OPENAI_EMBEDDING_MODEL, dimensions=OPENAI_EMBEDDING_DIMENSIONS)
+
 
 class HybridSchemaChunker:
     """하이브리드 청킹을 위한 메인 클래스"""
@@ -49,12 +144,15 @@ class HybridSchemaChunker:
 
         self.all_chunks = []  # 모든 청크를 저장할 리스트
 
+        self.embedding = None  # 임베딩 모델 (최초 사용 시 1회 로딩)
+        self.query_vectors = {}  # 질문 → 임베딩 벡터 캐시
+
     def extract_table_info(self, content, source_file):
         """기존 스키마: 테이블 정보를 추출하여 개별 청크로 생성"""
         chunks = []
 
         # 실제 파일 구조에 맞게 수정: 대문자 테이블명만 단독으로 있는 패턴
-        table_sections = re.split(r'\n(?=[A-Z_]+\n)', content)
+        table_sections = TABLE_SECTION_RE.split(content)
 
         for section in table_sections:
             section = section.strip()
@@ -84,24 +182,21 @@ class HybridSchemaChunker:
             file_key = source_file.replace('schema_', '').replace('.txt', '').replace('_detailed', '')
             domain_info = self.domain_map.get(file_key, {})
 
-            # 컬럼 정보 정리 (| 구분자 사용)
-            columns = []
-            for line in lines:
-                if '|' in line and not line.strip().startswith('#'):
-                    col_parts = line.split('|')
-                    if len(col_parts) >= 2:
-                        col_name = col_parts[0].strip()
-                        col_desc = col_parts[1].strip()
-                        # 빈 값이 아니고 테이블명이 아닌 경우만 추가
-                        if col_name and col_desc and col_name != table_name.upper():
-                            columns.append(f"{col_name}: {col_desc}")
+            # 컬럼 정보 정리 (| 구분자 사용, 앞 두 칸만 필요하므로 최대 2번만 분할)
+            table_upper = table_name.upper()
+            col_parts = (line.split('|', 2) for line in lines
+                         if '|' in line and not line.lstrip().startswith('#'))
+            # 빈 값이 아니고 테이블명이 아닌 경우만 추가
+            columns = [f"{col_name}: {col_desc}"
+                       for col_name, col_desc in ((parts[0].strip(), parts[1].strip()) for parts in col_parts)
+                       if col_name and col_desc and col_name != table_upper]
 
             # 컬럼이 없으면 스킵
             if not columns:
                 continue
 
             # 테이블 청크 생성
-            table_content = f"테이블: {table_name.upper()}\n"
+            table_content = f"테이블: {table_upper}\n"
             table_content += f"도메인: {domain_info.get('domain', '기타')}\n"
             table_content += f"컬럼 정보:\n" + "\n".join(columns[:15])  # 최대 15개 컬럼
 
@@ -125,7 +220,7 @@ class HybridSchemaChunker:
         chunks = []
 
         # Q&A 패턴 매칭
-        qa_pairs = re.findall(r"Q[:：]\s*(.*?)\nA[:：]\s*(.*?)(?=\n(?:Q[:：]|#|\d+\.|\Z))", content, re.DOTALL)
+        qa_pairs = parse_faq_pairs(content)
 
         file_key = source_file.replace('schema_', '').replace('.txt', '').replace('_detailed', '')
         domain_info = self.domain_map.get(file_key, {})
@@ -168,7 +263,7 @@ class HybridSchemaChunker:
         domain_info = self.domain_map.get(file_key, {})
 
         # 1. 메인 섹션별로 분할 (## 헤더 기준)
-        main_sections = re.split(r'\n## ', content)
+        main_sections = MAIN_SECTION_RE.split(content)
 
         for main_section in main_sections:
             main_section = main_section.strip()
@@ -179,7 +274,7 @@ class HybridSchemaChunker:
             section_title = main_section.split('\n')[0].strip()
 
             # 2. 하위 섹션으로 분할 (### 헤더 기준)
-            sub_sections = re.split(r'\n### ', main_section)
+            sub_sections = SUB_SECTION_RE.split(main_section)
 
             if len(sub_sections) <= 1:
                 # 하위 섹션이 없으면 메인 섹션을 그대로 청크로 생성
@@ -205,12 +300,12 @@ class HybridSchemaChunker:
                     sub_title = sub_section.split('\n')[0].strip()
 
                     # 테이블명 추출 시도
-                    table_match = re.search(r'^([A-Z_]+)', sub_title)
+                    table_match = TABLE_NAME_RE.search(sub_title)
                     table_name = table_match.group(1).lower() if table_match else "unknown"
 
                     # 3. 큰 섹션은 더 세분화 (**bold** 헤더 기준)
                     if len(sub_section) > 2000:
-                        detail_parts = re.split(r'\n\*\*(.+?)\*\*', sub_section)
+                        detail_parts = BOLD_HEADER_RE.split(sub_section)
 
                         for i, part in enumerate(detail_parts):
                             part = part.strip()
@@ -390,9 +485,15 @@ class HybridSchemaChunker:
 
         total_chunks = 0
 
-        # 1. 각 스키마 파일 처리
-        for filename in self.schema_files:
-            file_chunks = self.process_file(filename)
+        # 1. 각 스키마 파일 처리 (파일별 독립 작업이라 프로세스 병렬화 가능, 결과 순서는 유지)
+        workers = min(SCHEMA_CHUNK_WORKERS, len(self.schema_files))
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                file_results = list(executor.map(self.process_file, self.schema_files))
+        else:
+            file_results = [self.process_file(filename) for filename in self.schema_files]
+
+        for file_chunks in file_results:
             self.all_chunks.extend(file_chunks)
             total_chunks += len(file_chunks)
 
@@ -413,14 +514,10 @@ class HybridSchemaChunker:
 
     def create_vectordb(self, chunks):
         """벡터 DB 생성"""
-        print("\n🤖 임베딩 모델 로딩...")
+        print(f"\n🤖 임베딩 모델 로딩... ({EMBEDDING_BACKEND})")
 
         # 임베딩 모델 설정 (멀티턴 평가에 최적화)
-        embedding = HuggingFaceEmbeddings(
-            model_name="intfloat/multilingual-e5-large",
-            model_kwargs={'device': 'cpu'},
-            encode_kwargs={'normalize_embeddings': True}
-        )
+        embedding = self.get_embedding()
 
         print("💾 벡터 DB 생성 중...")
 
@@ -430,16 +527,42 @@ class HybridSchemaChunker:
             shutil.rmtree("chroma_db")
 
         # Chroma DB 생성 (하이브리드 검색 지원)
+        # HNSW 그래프는 생성 시 촘촘하게 구성해 검색 시 적은 후보로도 recall 확보
         vectordb = Chroma.from_documents(
             chunks,
             embedding,
             persist_directory="./chroma_db",
-            collection_metadata={"hnsw:space": "cosine"}
+            collection_metadata={
+                "hnsw:space": "cosine",
+                "hnsw:M": 32,
+                "hnsw:construction_ef": 200,
+                "hnsw:search_ef": 64
+            }
         )
 
         print("✅ 벡터 DB 생성 완료!")
         return vectordb
 
+    def get_embedding(self):
+        """임베딩 모델 반환 (인스턴스 내에서 재사용)"""
+        if self.embedding is None:
+            self.embedding = get_embedding()
+        return self.embedding
+
+    def embed_query(self, query):
+        """질문 임베딩 (같은 질문은 캐시된 벡터 재사용)"""
+        if query not in self.query_vectors:
+            self.query_vectors[query] = self.get_embedding().embed_query(query)
+        return self.query_vectors[query]
+
+    def embed_queries(self, queries):
+        """여러 질문을 임베딩 호출 1회로 처리 (캐시에 없는 질문만 배치)"""
+        pending = [q for q in dict.fromkeys(queries) if q not in self.query_vectors]
+        if pending:
+            vectors = self.get_embedding().embed_documents(pending)
+            self.query_vectors.update(zip(pending, vectors))
+        return [self.query_vectors[q] for q in queries]
+
     def generate_stats(self, chunks):
         """통계 정보 생성"""
         stats = {
@@ -476,9 +599,15 @@ class HybridSchemaChunker:
             "ADMISSIONS 테이블 구조"  # 상세 정보
         ]
 
-        for query in test_queries:
+        # 테스트 질문 전체를 한 번에 임베딩
+        query_vectors = self.embed_queries(test_queries)
+
+        for query, query_vector in zip(test_queries, query_vectors):
             print(f"\n질문: '{query}'")
-            results = vectordb.similarity_search(query, k=3)
+            # MMR: 후보를 넓게 가져온 뒤 중복 청크를 걸러 다양한 결과 반환
+            results = vectordb.max_marginal_relevance_search_by_vector(
+                query_vector, k=3, fetch_k=12, lambda_mult=0.5
+            )
 
             for i, doc in enumerate(results):
                 chunk_type = doc.metadata.get('type', 'unknown')
@@ -13,6 +13,8 @@ from langsmith.run_helpers import traceable
 from langchain.callbacks.base import BaseCallbackHandler  # LangChain 콜백
 import hashlib
 import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, Any, Optional
 
 # === [1] 평가 모듈 import ===
@@ -143,14 +145,19 @@ class TokenCallback(BaseCallbackHandler):
 token_callback = TokenCallback()
 
 
+KOREAN_CHAR_RE = re.compile(r'[가-힣]')
+ENGLISH_WORD_RE = re.compile(r'\b[a-zA-Z]+\b')
+
+
 def estimate_token_usage(text):
     """텍스트의 대략적인 토큰 수 추정"""
     if not text:
         return 0
     # 대략적으로 한국어는 글자당 1.5토큰, 영어는 단어당 1.3토큰으로 추정
-    korean_chars = len(re.findall(r'[가-힣]', text))
-    english_words = len(re.findall(r'\b[a-zA-Z]+\b', text))
-    other_chars = len(text) - korean_chars - sum(len(word) for word in re.findall(r'\b[a-zA-Z]+\b', text))
+    korean_chars = len(KOREAN_CHAR_RE.findall(text))
+    english = ENGLISH_WORD_RE.findall(text)
+    english_words = len(english)
+    other_chars = len(text) - korean_chars - sum(len(word) for word in english)
 
     estimated_tokens = int(korean_chars * 1.5 + english_words * 1.3 + other_chars * 0.5)
     return max(estimated_tokens, 1)
@@ -230,14 +237,17 @@ def compare_execution_results(generated_sql, target_sql, cache):
     try:
         print(f"🔍 [EXEC_MATCH] 실행 결과 비교 시작")
 
-        # 생성된 SQL 실행
-        generated_result = run_sql_query_cached(generated_sql, cache)
+        # 생성 SQL과 정답 SQL은 서로 독립적이므로 동시에 실행 (세션 풀에서 각각 커넥션 사용)
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            generated_future = executor.submit(run_sql_query_cached, generated_sql, cache)
+            target_future = executor.submit(run_sql_query_cached, target_sql, cache)
+            generated_result = generated_future.result()
+            target_result = target_future.result()
+
         if not generated_result["success"]:
             print(f"❌ 생성 SQL 실행 실패: {generated_result.get('error')}")
             return False
 
-        # 정답 SQL 실행
-        target_result = run_sql_query_cached(target_sql, cache)
         if not target_result["success"]:
             print(f"❌ 정답 SQL 실행 실패: {target_result.get('error')}")
             return False
@@ -281,6 +291,7 @@ class SQLResultCache:
         self.ttl_seconds = ttl_seconds
         self.hit_count = 0  # 캐시 히트 횟수
         self.miss_count = 0  # 캐시 미스 횟수
+        self._lock = threading.Lock()  # 여러 스레드에서 동시에 조회/저장
 
     def _generate_cache_key(self, sql: str) -> str:
         """SQL 문자열로부터 캐시 키 생성"""
@@ -307,32 +318,35 @@ class SQLResultCache:
         """캐시에서 SQL 실행 결과 조회"""
         cache_key = self._generate_cache_key(sql)
 
-        if cache_key in self.cache:
-            entry = self.cache[cache_key]
-            if not self._is_expired(entry):
-                self.hit_count += 1
-                return entry['result']
-            else:
-                # 만료된 항목 제거
-                del self.cache[cache_key]
+        with self._lock:
+            if cache_key in self.cache:
+                entry = self.cache[cache_key]
+                if not self._is_expired(entry):
+                    self.hit_count += 1
+                    return entry['result']
+                else:
+                    # 만료된 항목 제거
+                    del self.cache[cache_key]
 
-        self.miss_count += 1
-        return None
+            self.miss_count += 1
+            return None
 
     def put(self, sql: str, result: Dict[str, Any]):
         """SQL 실행 결과를 캐시에 저장"""
-        # 캐시 크기 관리
-        if len(self.cache) >= self.max_size:
-            # 가장 오래된 항목부터 제거
-            oldest_key = min(self.cache.keys(),
-                             key=lambda k: self.cache[k]['timestamp'])
-            del self.cache[oldest_key]
-
         cache_key = self._generate_cache_key(sql)
-        self.cache[cache_key] = {
-            'result': result,
-            'timestamp': time.time()
-        }
+
+        with self._lock:
+            # 캐시 크기 관리
+            if len(self.cache) >= self.max_size:
+                # 가장 오래된 항목부터 제거
+                oldest_key = min(self.cache.keys(),
+                                 key=lambda k: self.cache[k]['timestamp'])
+                del self.cache[oldest_key]
+
+            self.cache[cache_key] = {
+                'result': result,
+                'timestamp': time.time()
+            }
 
     def get_stats(self) -> Dict[str, Any]:
         """캐시 통계 반환"""
@@ -380,32 +394,55 @@ def run_sql_query_cached(sql, cache):
         }
 
 
+# === Oracle 세션 풀 (쿼리마다 connect/인증하지 않도록 재사용) ===
+_oracle_pool = None
+_oracle_pool_lock = threading.Lock()
+
+
+def get_oracle_pool():
+    """첫 사용 시 SessionPool 생성 후 재사용"""
+    global _oracle_pool
+    if _oracle_pool is not None:
+        return _oracle_pool
+
+    with _oracle_pool_lock:
+        if _oracle_pool is None:
+            ORACLE_USER = os.getenv("ORACLE_USER", "GPTify")
+            ORACLE_PW = os.getenv("ORACLE_PW", "oracle_4U")
+            ORACLE_HOST = os.getenv("ORACLE_HOST", "138.2.63.245")
+            ORACLE_PORT = int(os.getenv("ORACLE_PORT", "1521"))
+            ORACLE_SERVICE = os.getenv("ORACLE_SERVICE", "srvinv.sub03250142080.kdtvcn.oraclevcn.com")
+
+            dsn = cx_Oracle.makedsn(ORACLE_HOST, ORACLE_PORT, service_name=ORACLE_SERVICE)
+            _oracle_pool = cx_Oracle.SessionPool(
+                user=ORACLE_USER, password=ORACLE_PW, dsn=dsn,
+                min=2, max=10, increment=1, threaded=True,
+                getmode=cx_Oracle.SPOOL_ATTRVAL_WAIT
+            )
+    return _oracle_pool
+
+
 def run_sql_query_direct(sql):
     """SQL 쿼리를 직접 실행"""
     try:
-        ORACLE_USER = os.getenv("ORACLE_USER", "GPTify")
-        ORACLE_PW = os.getenv("ORACLE_PW", "oracle_4U")
-        ORACLE_HOST = os.getenv("ORACLE_HOST", "138.2.63.245")
-        ORACLE_PORT = int(os.getenv("ORACLE_PORT", "1521"))
-        ORACLE_SERVICE = os.getenv("ORACLE_SERVICE", "srvinv.sub03250142080.kdtvcn.oraclevcn.com")
-
-        dsn = cx_Oracle.makedsn(ORACLE_HOST, ORACLE_PORT, service_name=ORACLE_SERVICE)
-        conn = cx_Oracle.connect(user=ORACLE_USER, password=ORACLE_PW, dsn=dsn)
-        cursor = conn.cursor()
-
-        cursor.execute(sql)
-        columns = [desc[0] for desc in cursor.description]
-        rows = cursor.fetchall()
-
-        result = []
-        for row in rows:
-            row_dict = {}
-            for i, value in enumerate(row):
-                row_dict[columns[i]] = value
-            result.append(row_dict)
-
-        cursor.close()
-        conn.close()
+        pool = get_oracle_pool()
+        conn = pool.acquire()
+        try:
+            cursor = conn.cursor()
+
+            # fetchall 왕복 횟수 감소 (기본 arraysize=100, prefetchrows=2)
+            cursor.arraysize = 500
+            cursor.prefetchrows = 501
+
+            cursor.execute(sql)
+            columns = [desc[0] for desc in cursor.description]
+            # fetch 단계에서 바로 dict 생성 (행 목록을 두 번 만들지 않음)
+            cursor.rowfactory = lambda *values: dict(zip(columns, values))
+            result = cursor.fetchall()
+            cursor.close()
+        finally:
+            # 실패해도 커넥션은 풀에 반납
+            pool.release(conn)
 
         return {
             "success": True,
@@ -803,6 +840,8 @@ class MultiTurnEvaluationManager:
         self.sql_evaluator = sql_evaluator
         self.current_session = None
         self.session_file = "multiturn_sessions.json"
+        self._sessions_data = None  # 세션 파일 내용 (메모리 사본)
+        self._sessions_mtime = None  # 메모리 사본을 읽은 시점의 파일 수정 시각
         self.clause_analyzer = ClauseProgressAnalyzer(sql_evaluator.evaluator, sql_evaluator.schema)
 
     def start_new_session(self, max_turns=5):
@@ -927,18 +966,27 @@ class MultiTurnEvaluationManager:
 
         return len(self.current_session.turns)
 
+    def _load_sessions(self):
+        """세션 파일 로드 (파일이 바뀌지 않았으면 메모리 사본 재사용)"""
+        try:
+            mtime = os.path.getmtime(self.session_file)
+        except OSError:
+            return {"multiturn_sessions": []}
+
+        if self._sessions_data is None or mtime != self._sessions_mtime:
+            with open(self.session_file, 'r', encoding='utf-8') as f:
+                self._sessions_data = json.load(f)
+            self._sessions_mtime = mtime
+        return self._sessions_data
+
     def save_session(self):
         """현재 세션을 파일에 저장"""
         if not self.current_session:
             return
 
         try:
-            # 기존 세션들 로드
-            if os.path.exists(self.session_file):
-                with open(self.session_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-            else:
-                data = {"multiturn_sessions": []}
+            # 기존 세션들 로드 (턴마다 파일 전체를 다시 파싱하지 않음)
+            data = self._load_sessions()
 
             # 현재 세션 추가
             sessions = data.get("multiturn_sessions", [])
@@ -962,18 +1010,11 @@ class MultiTurnEvaluationManager:
             data["multiturn_sessions"] = sessions
             with open(self.session_file, 'w', encoding='utf-8') as f:
                 json.dump(data, f, indent=2, ensure_ascii=False)
+            self._sessions_data = data
+            self._sessions_mtime = os.path.getmtime(self.session_file)
 
             print(f"✅ [SAVE] 세션 저장 완료: {len(sessions)}개 세션")
 
-            # 🔥 저장 검증
-            try:
-                with open(self.session_file, 'r', encoding='utf-8') as f:
-                    verify_data = json.load(f)
-                verify_sessions = verify_data.get('multiturn_sessions', [])
-                print(f"✅ [SAVE_VERIFY] 저장 검증 성공: {len(verify_sessions)}개 세션 확인")
-            except Exception as verify_error:
-                print(f"❌ [SAVE_VERIFY] 저장 검증 실패: {verify_error}")
-
         except Exception as e:
             print(f"❌ 세션 저장 실패: {e}")
             import traceback
@@ -0,0 +1,15 @@
+# gunicorn.conf.py
+# Railway 배포용 Gunicorn 설정
+# /chat은 OpenAI/Oracle 응답 대기(I/O)가 대부분이므로 스레드 워커로 동시 요청 처리
+
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+
+# 워커당 스레드 수는 Oracle 세션 풀 최대치(ORACLE_POOL_MAX) 이하로 유지
+worker_class = "gthread"
+workers = int(os.getenv('WEB_CONCURRENCY', '2'))
+threads = int(os.getenv('GUNICORN_THREADS', '8'))
+
+# GPT 호출 + SQL 실행이 길어질 수 있으므로 기본 30초보다 여유 있게
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '120'))
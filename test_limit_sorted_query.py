@@ -0,0 +1,40 @@
+"""limit_sorted_query 테스트 (저장소 루트에서 실행: python -m pytest -q)"""
+
+from app import limit_sorted_query
+
+
+def test_appends_fetch_first_to_top_level_order_by():
+    sql = "SELECT subject_id FROM MIMICIV.PATIENTS ORDER BY anchor_age DESC;"
+    assert limit_sorted_query(sql, limit=10) == (
+        "SELECT subject_id FROM MIMICIV.PATIENTS ORDER BY anchor_age DESC\nFETCH FIRST 10 ROWS ONLY"
+    )
+
+
+def test_keeps_query_with_rownum_and_order_by():
+    sql = "SELECT * FROM MIMICIV.PATIENTS WHERE ROWNUM <= 5 ORDER BY anchor_age"
+    assert limit_sorted_query(sql) == sql
+
+
+def test_keeps_query_with_existing_fetch_first():
+    sql = "SELECT * FROM MIMICIV.PATIENTS ORDER BY anchor_age FETCH FIRST 5 ROWS ONLY"
+    assert limit_sorted_query(sql) == sql
+
+
+def test_keeps_query_when_order_by_is_inside_subquery():
+    sql = "SELECT * FROM (SELECT subject_id FROM MIMICIV.PATIENTS ORDER BY anchor_age) WHERE subject_id > 1"
+    assert limit_sorted_query(sql) == sql
+
+
+def test_ignores_keywords_inside_string_literals():
+    # 리터럴 안의 ORDER BY는 정렬이 아님
+    sql = "SELECT * FROM MIMICIV.D_ITEMS WHERE label = 'ORDER BY ('"
+    assert limit_sorted_query(sql) == sql
+
+    # 리터럴 안의 ROWNUM/괄호는 행 제한/서브쿼리로 보지 않음
+    sql = "SELECT * FROM MIMICIV.D_ITEMS WHERE label = 'ROWNUM (' ORDER BY itemid"
+    assert limit_sorted_query(sql, limit=10) == sql + "\nFETCH FIRST 10 ROWS ONLY"
+
+
+def test_trailing_line_comment_does_not_swallow_fetch_first():
+    sql = "SELECT * FROM MIMICIV.PATIENTS ORDER BY anchor_age -- 나이순"
+    assert limit_sorted_query(sql, limit=10) == sql + "\nFETCH FIRST 10 ROWS ONLY"